@@ -15,15 +15,28 @@
 # under the CC0 and OWFa
 
 import argparse
-import base64
-import math
-import random
-import functools
+import secrets
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import sha256
 import string
 
+# NumPy is optional: when available it lets us evaluate the share
+# polynomial at all x-values in one batched sweep instead of one
+# Python loop per share.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Numba-JIT kernels (sss_fast.py) keep the whole share evaluation in
+# machine integers for the default 127-bit prime; optional as well.
+try:
+    import sss_fast
+except ImportError:
+    sss_fast = None
+
 # ---------------------- CONFIG VARS ----------------------
 
 # Program info
@@ -39,6 +52,9 @@ MIN_SHARDS = 3
 SHARD_PATH = './shards'
 DEBUG = False
 ASCII_MODE = True
+# Version 2 fingerprints are the first 8 digest bytes as hex; version 1
+# (shard files without a fingerprint_version field) sliced hexdigest()[1:17]
+FINGERPRINT_VERSION = 2
 
 # 12th Mersenne Prime
 # (for this application we want a known prime number as close as
@@ -48,58 +64,176 @@ ASCII_MODE = True
 _PRIME = 2 ** 127 - 1
 # The 13th Mersenne Prime is 2**521 - 1
 
-_RINT = functools.partial(random.SystemRandom().randint, 0)
+def _rand_coeff(prime):
+    """Draws a random polynomial coefficient from the OS CSPRNG. For the
+    default 127-bit Mersenne prime a single randbits(127) call suffices;
+    other primes fall back to the rejection-sampling randbelow.
+    """
+    if prime == _PRIME:
+        return secrets.randbits(127)
+    return secrets.randbelow(prime)
 
 # ------- Core Algorithm Functions -------
 
+def _mersenne127_reduce(a):
+    """Reduces a (non-negative, < _PRIME**2) modulo the Mersenne prime
+    2**127 - 1 using only shifts and masks, which is much cheaper than a
+    general big-int ``%`` on the 254-bit intermediates of the hot loops.
+    """
+    r = (a & _PRIME) + (a >> 127)
+    r = (r & _PRIME) + (r >> 127)
+    if r >= _PRIME:
+        r -= _PRIME
+    return r
+
+class _Montgomery:
+    """Montgomery-form arithmetic for an arbitrary odd prime, so the
+    modular products in the interpolation loop cost shifts and
+    multiplies instead of a general big-int %. The default Mersenne
+    modulus never takes this path (its shift/mask fold is cheaper), but
+    it keeps non-Mersenne primes viable without touching the callers.
+    """
+    def __init__(self, p):
+        self.p = p
+        self.bits = p.bit_length()
+        self.mask = (1 << self.bits) - 1
+        self.r2 = (1 << 2 * self.bits) % p
+        # n' = -p^-1 mod R, the Montgomery reduction constant
+        self.n_prime = -pow(p, -1, 1 << self.bits) & self.mask
+
+    def reduce(self, t):
+        """Computes t * R^-1 mod p for t < p * R."""
+        m = (t & self.mask) * self.n_prime & self.mask
+        u = (t + m * self.p) >> self.bits
+        if u >= self.p:
+            u -= self.p
+        return u
+
+    def to_mont(self, x):
+        return self.reduce(x % self.p * self.r2)
+
+    def from_mont(self, x):
+        return self.reduce(x)
+
+    def mul(self, a, b):
+        return self.reduce(a * b)
+
 def _eval_at(poly, x, prime):
     """Evaluates polynomial (coefficient tuple) at x, used to generate a
     shamir pool in make_random_shares below.
     """
     accum = 0
-    for coeff in reversed(poly):
+    poly_rev = poly[::-1]
+    for coeff in poly_rev:
         accum *= x
         accum += coeff
         accum %= prime
     return accum
 
+def _eval_at_m127(poly_rev, x):
+    """Horner evaluation specialized for the default Mersenne prime,
+    taking an already-reversed coefficient list so the hot loop is a
+    plain iteration with the cheap shift/mask reduction.
+    """
+    reduce = _mersenne127_reduce
+    accum = 0
+    for coeff in poly_rev:
+        accum = reduce(accum * x + coeff)
+    return accum
+
 def make_random_shares(secret, minimum, shares, prime=_PRIME):
     """
     Generates a random shamir pool for a given secret, returns share points.
     """
     if minimum > shares:
         raise ValueError("Pool secret would be irrecoverable.")
-    poly = [secret] + [_RINT(prime - 1) for i in range(minimum - 1)]
-    points = [(i, _eval_at(poly, i, prime))
-              for i in range(1, shares + 1)]
+    rand_coeff = _rand_coeff  # avoid the global lookup per coefficient
+    poly = [secret] + [rand_coeff(prime) for i in range(minimum - 1)]
+    if prime == _PRIME:
+        # The limb-based JIT kernel only represents 127-bit values; wider
+        # secrets stay on the bignum paths, which reduce them mod prime
+        if sss_fast is not None and secret.bit_length() <= 127:
+            return sss_fast.eval_shares(poly, shares)
+        if np is not None:
+            return _eval_batch_m127(poly, shares)
+        poly_rev = poly[::-1]
+        points = [(i, _eval_at_m127(poly_rev, i))
+                  for i in range(1, shares + 1)]
+    else:
+        points = [(i, _eval_at(poly, i, prime))
+                  for i in range(1, shares + 1)]
     return points
 
-def _extended_gcd(a, b):
+def _eval_batch_m127(poly, shares):
+    """Evaluates the polynomial at all x in 1..shares with a single
+    Horner sweep over a NumPy object vector, so the per-coefficient work
+    is one vector operation instead of one Python loop per share.
+    """
+    xs = np.arange(1, shares + 1, dtype=object)
+    accum = np.zeros(shares, dtype=object)
+    for coeff in reversed(poly):
+        accum = accum * xs + coeff
+        accum = (accum & _PRIME) + (accum >> 127)
+        accum = (accum & _PRIME) + (accum >> 127)
+    accum = np.where(accum >= _PRIME, accum - _PRIME, accum)
+    return list(zip(range(1, shares + 1), accum.tolist()))
+
+# Iteration bound for the divstep inverse below; ~370 steps suffice for
+# 127-bit inputs (Bernstein-Yang convex-hull bound), 500 adds margin
+_SAFEGCD_ITERATIONS = 500
+
+def _div2(p, x):
+    """Halves x modulo the odd prime p (adds p first if x is odd)."""
+    if x & 1:
+        x += p
+    return x >> 1
+
+def _modinv_ct(a, p=_PRIME, iterations=_SAFEGCD_ITERATIONS):
+    """Modular inverse via Bernstein-Yang divsteps (safegcd) with a
+    fixed iteration count, so the number of loop iterations no longer
+    depends on the denominator the way the textbook Euclidean inverse
+    does. CPython big-int operations are not themselves constant-time,
+    but this removes the dominant iteration-count leak on the path that
+    handles share denominators during recovery.
+    """
+    delta, f, g = 1, p, a % p
+    d, e = 0, 1  # invariants: f == d*a and g == e*a (mod p)
+    for _ in range(iterations):
+        if delta > 0 and g & 1:
+            delta, f, g, d, e = 1 - delta, g, (g - f) >> 1, e, _div2(p, e - d)
+        elif g & 1:
+            delta, f, g, d, e = 1 + delta, f, (g + f) >> 1, d, _div2(p, e + d)
+        else:
+            delta, f, g, d, e = 1 + delta, f, g >> 1, d, _div2(p, e)
+    # f has converged to +-gcd(a, p) = +-1, so d*f is the inverse
+    return (d * f) % p
+
+def _modinv_vartime(a, p):
+    """Variable-time modular inverse for non-sensitive callers; the
+    built-in three-argument pow runs the extended GCD in C.
     """
-    Division in integers modulus p means finding the inverse of the
-    denominator modulo p and then multiplying the numerator by this
-    inverse (Note: inverse of A is B such that A*B % p == 1). This can
-    be computed via the extended Euclidean algorithm
-    http://en.wikipedia.org/wiki/Modular_multiplicative_inverse#Computation
+    return pow(a, -1, p)
+
+def _modinv(a, p):
+    """Dispatches to the fixed-iteration inverse for the default prime
+    (whose bit length matches _SAFEGCD_ITERATIONS) and to the built-in
+    inverse otherwise.
     """
-    x = 0
-    last_x = 1
-    y = 1
-    last_y = 0
-    while b != 0:
-        quot = a // b
-        a, b = b, a % b
-        x, last_x = last_x - quot * x, x
-        y, last_y = last_y - quot * y, y
-    return last_x, last_y
+    if p == _PRIME:
+        return _modinv_ct(a, p)
+    return _modinv_vartime(a, p)
 
 def _divmod(num, den, p):
     """Compute num / den modulo prime p
-    To explain this, the result will be such that: 
+    To explain this, the result will be such that:
     den * _divmod(num, den, p) % p == num
+    The result is fully reduced so unreduced products never accumulate
+    in the callers, where big-int multiply cost grows super-linearly.
     """
-    inv, _ = _extended_gcd(den, p)
-    return num * inv
+    inv = _modinv(den, p)
+    if p == _PRIME:
+        return _mersenne127_reduce(num % p * inv)
+    return num * inv % p
 
 def _lagrange_interpolate(x:int, x_s:tuple, y_s:tuple, p):
     """
@@ -107,24 +241,72 @@ def _lagrange_interpolate(x:int, x_s:tuple, y_s:tuple, p):
     k points will define a polynomial of up to kth order.
     """
     k = len(x_s)
-    assert k == len(set(x_s)), "points must be distinct"
-    def PI(vals):  # upper-case PI -- product of inputs
-        accum = 1
-        for v in vals:
-            accum *= v
-        return accum
-    nums = []  # avoid inexact division
+    # nums[i] = PI(x - x_j for j != i), built from prefix/suffix products
+    # of the differences so we need O(k) big-int multiplications instead
+    # of recomputing the near-identical product k times.
+    diffs = [x - xi for xi in x_s]
+    pre = [1] * k  # pre[i] = diffs[0] * ... * diffs[i-1]
+    for i in range(1, k):
+        pre[i] = pre[i - 1] * diffs[i - 1]
+    suf = [1] * k  # suf[i] = diffs[i+1] * ... * diffs[k-1]
+    for i in range(k - 2, -1, -1):
+        suf[i] = suf[i + 1] * diffs[i + 1]
+    nums = [pre[i] * suf[i] for i in range(k)]  # avoid inexact division
     dens = []
     for i in range(k):
-        others = list(x_s)
-        cur = others.pop(i)
-        nums.append(PI(x - o for o in others))
-        dens.append(PI(cur - o for o in others))
-    den = PI(dens)
-    num = sum([_divmod(nums[i] * den * y_s[i] % p, dens[i], p)
-               for i in range(k)])
+        cur = x_s[i]
+        den_i = 1
+        for j in range(i):
+            den_i *= cur - x_s[j]
+        for j in range(i + 1, k):
+            den_i *= cur - x_s[j]
+        dens.append(den_i)
+    den = 1
+    for den_i in dens:
+        den = den * den_i % p
+    divmod_p = _divmod  # local binding for the summation loop
+    if p == _PRIME:
+        # Mersenne fold keeps every intermediate within two reductions
+        reduce_ = _mersenne127_reduce
+        num = sum([divmod_p(reduce_(reduce_(nums[i] % p * den) * (y_s[i] % p)),
+                            dens[i], p)
+                   for i in range(k)])
+    else:
+        # Montgomery form trades the general % in the product chain for
+        # shift/multiply reductions
+        mont = _Montgomery(p)
+        den_m = mont.to_mont(den)
+        num = sum([divmod_p(mont.from_mont(
+                                mont.mul(mont.mul(mont.to_mont(nums[i]), den_m),
+                                         mont.to_mont(y_s[i]))),
+                            dens[i], p)
+                   for i in range(k)])
     return (_divmod(num, den, p) + p) % p
 
+def _interpolate_at_zero(x_s, y_s, p):
+    """
+    Barycentric Lagrange evaluation specialized to x = 0, the only point
+    secret recovery ever needs. Each term's weight 1 / (-x_i * PI(x_i - x_j))
+    folds the barycentric weight and the (x - x_i) divisor into a single
+    modular inverse, so the whole evaluation is k + 1 inverses and O(k)
+    additions instead of the general interpolation machinery.
+    """
+    k = len(x_s)
+    num = 0
+    den = 0
+    modinv = _modinv  # local binding for the hot loop
+    for i in range(k):
+        cur = x_s[i]
+        w = -cur
+        for j in range(i):
+            w *= cur - x_s[j]
+        for j in range(i + 1, k):
+            w *= cur - x_s[j]
+        t = modinv(w, p)
+        num = (num + t * y_s[i]) % p
+        den = (den + t) % p
+    return num * modinv(den, p) % p
+
 def recover_secret(shares:list, min:int, prime=_PRIME):
     """
     Recover the secret from share points
@@ -133,11 +315,29 @@ def recover_secret(shares:list, min:int, prime=_PRIME):
     if len(shares) < min:
         raise ValueError(f"need at least {min} shares")
     x_s, y_s = zip(*shares)
-    return _lagrange_interpolate(0, x_s, y_s, prime)
+    # Enforced here once rather than per interpolation call; a plain
+    # raise also survives python -O, unlike the old assert
+    if len(set(x_s)) != len(x_s):
+        raise ValueError("shares must have distinct ids")
+    return _interpolate_at_zero(x_s, y_s, prime)
 
 
 # ------- Helpers -------
 
+# Computes the shard fingerprint from the raw bytes of id and value,
+# avoiding the costly big-int-to-decimal-string conversion (and the
+# Python 3.11+ int/str digit limit) of hashing an f-string
+def _fingerprint(id:int, value:int, version:int=FINGERPRINT_VERSION):
+    if version == 1:
+        # legacy format, as written by v0.2.1: hashes the f-string
+        # rendering and drops the first hex nibble of the digest
+        return sha256(f"{id}_{value}".encode()).hexdigest()[1:17]
+    h = sha256()
+    h.update(id.to_bytes(4, 'big'))
+    h.update(value.to_bytes(16, 'big'))
+    return h.digest()[:8].hex()
+
+
 # Converts a string into an integer represtation of its byte array
 def secret_to_int(secret:str):
 
@@ -163,22 +363,18 @@ def secret_to_int(secret:str):
             exit(1)
 
     else:
-        # Convert to Base64 for predictable characters
-        secret_b64 = base64.b64encode(secret.encode('utf-8'))
-
-        # Convert into bitstring, with each character taking 7 bits
-        secret_bin = ''.join(item[2:].zfill(7) for item in map(bin, secret_b64))
-
-        # Convert to integer for SSS processing
-        secret_int = int(secret_bin, 2)
+        # Interpret the UTF-8 bytes as a big-endian integer, with the
+        # byte length appended in the lowest byte so leading zero bytes
+        # survive the round trip
+        secret_bytes = secret.encode('utf-8')
+        secret_int = int.from_bytes(secret_bytes, 'big') << 8 | len(secret_bytes)
 
         if DEBUG:
             print(f"[SPLIT]: Secret: {secret}")
-            print(f"[SPLIT]: Secret b64: {secret_b64}")
-            print(f"[SPLIT]: Secret bin: {secret_bin}")
+            print(f"[SPLIT]: Secret bytes: {secret_bytes}")
             print(f"[SPLIT]: Secret int: {secret_int}")
 
-    
+
     return secret_int
 
 
@@ -188,37 +384,49 @@ def int_to_secret(secret_int:int):
     secret = ""
 
     if ASCII_MODE:
-        for x in range(int(len(str(secret_int))/2)):
-            char_int = int(str(secret_int)[x*2:(x+1)*2])
+        # Peel off the 2-digit pairs arithmetically instead of rendering
+        # the whole int to a string and re-parsing every slice with int()
+        chars = []
+        while secret_int:
+            secret_int, char_int = divmod(secret_int, 100)
             if char_int < 30:
                 char_int += 100
-            secret += chr(char_int)
+            chars.append(chr(char_int))
+        secret = ''.join(reversed(chars))
 
     else:
-        secret_bin = bin(secret_int)[2:]
-        secret_b64 = ""
-
-        # Convert the bitstring back to Base 64
-        for x in range(math.ceil(len(secret_bin) / 7)):
-            char = int(secret_bin[x * 7:(x + 1) * 7], 2)
-            secret_b64 += chr(char)
+        # Split off the length byte, then convert the remaining integer
+        # back to its big-endian byte representation
+        length = secret_int & 0xFF
+        secret_bytes = (secret_int >> 8).to_bytes(length, 'big')
 
         if DEBUG:
             print(f"[JOIN]: Secret int: {secret_int}")
-            print(f"[JOIN]: Secret bin: {secret_bin}")
-            print(f"[JOIN]: Secret b64: {secret_b64}")
+            print(f"[JOIN]: Secret bytes: {secret_bytes}")
 
-        # Decode the Base64 to the original secret
-        secret = (base64.b64decode(secret_b64)).decode('utf-8')
+        secret = secret_bytes.decode('utf-8')
 
         if DEBUG:
             print(f"[JOIN]: Secret: {secret}")
-    
+
     return secret
 
 
 # ------- Wrapper Functions -------
 
+# Writes a single (path, shard_obj) payload; the GIL is released during
+# the actual file I/O, so these can run on a thread pool
+def _write_shard(payload):
+    out_path, shard_obj = payload
+    with open(out_path + ".tmp", "w") as outfile:
+        json.dump(shard_obj, outfile, separators=(',', ':'))
+    os.replace(out_path + ".tmp", out_path)
+
+# Reads and parses a single shard file
+def _load_shard(file_path):
+    with open(file_path) as f:
+        return json.load(f)
+
 # Splits a secret into shards and saves those to files as JSON
 def split_secret(secret:str, min:int, max:int):
     print(f"Splitting secret {secret}")
@@ -230,19 +438,21 @@ def split_secret(secret:str, min:int, max:int):
         print(f"ERROR: Could not recombine the created shards, input is likely too long")
         exit(1)
 
-    # Generate fingerprints
+    # Generate fingerprints once, reused for the shard objects below
     fingerprints = []
     for shard in shards:
         id, value = shard
-        fingerprint = sha256(f"{id}_{value}".encode()).hexdigest()[1:17]
+        fingerprint = _fingerprint(id, value)
         fingerprints.append(fingerprint)
 
     outfiles = []
+    os.makedirs(SHARD_PATH, exist_ok=True)
 
-    # Generate full objects and write them to files
-    for shard in shards:
+    # Generate full objects, then write all files on a thread pool since
+    # the per-shard writes are independent and I/O-bound
+    payloads = []
+    for shard, fingerprint in zip(shards, fingerprints):
         id, value = shard
-        fingerprint = sha256(f"{id}_{value}".encode()).hexdigest()[1:17]
         outfiles.append(f"{id}_{fingerprint}.json")
 
         # Dictionary that holds all relevant information for reconstruction & verification
@@ -250,17 +460,18 @@ def split_secret(secret:str, min:int, max:int):
             'id': id,
             'shard': value,
             'fingerprint': fingerprint,
+            'fingerprint_version': FINGERPRINT_VERSION,
             'total_shards': max,
             'min_shards': min,
             'fingerprints': fingerprints
         }
 
-        # Serializing as json
-        json_object = json.dumps(shard_obj, indent=4)
- 
-        # Writing to json file
-        with open(f"{SHARD_PATH}/{id}_{fingerprint}.json", "w") as outfile:
-            outfile.write(json_object)
+        payloads.append((f"{SHARD_PATH}/{id}_{fingerprint}.json", shard_obj))
+
+    # NB: the min/max builtins are shadowed by this function's parameters
+    workers = len(payloads) if len(payloads) < 8 else 8
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(_write_shard, payloads))
 
     return outfiles
 
@@ -269,33 +480,58 @@ def join_secrets(shard_files:list):
 
     shard_tuples = []
 
-    # Check if files exist and parse them
+    # Check if files exist
     for file_path in shard_files:
         if not os.path.isfile(file_path):
             print(f"ERROR: Shard path '{file_path}' is not a file")
             return False
-        
-        with open(file_path) as f:
-
-            # get values from file
-            shard_obj = json.load(f)
-            id = shard_obj['id']
-            value = shard_obj['shard']
-            fingerprint = shard_obj['fingerprint']
-            min_shards = shard_obj['min_shards']
-
-            if len(shard_files) < min_shards:
-                print(f"ERROR: Number of supplied shards ({len(shard_files)}) is smaller than number of minimum shards ({min_shards})")
-                return False
-
-            # Check fingerprint
-            fingerprint_new = sha256(f"{id}_{value}".encode()).hexdigest()[1:17]
-            if fingerprint != fingerprint_new:
-                print(f"ERROR: Fingerprint for shard #{id} not matching")
-                return False
-            
-            # Build the tuple for further processing
-            shard_tuples.append((id, value))
+
+    # Peek at the first shard for the threshold, so the count check runs
+    # once and only the files actually needed are parsed
+    first_obj = _load_shard(shard_files[0])
+    min_shards = first_obj['min_shards']
+
+    if len(shard_files) < min_shards:
+        print(f"ERROR: Number of supplied shards ({len(shard_files)}) is smaller than number of minimum shards ({min_shards})")
+        return False
+
+    # Only min_shards shards are needed for reconstruction; parse the
+    # remaining ones on a thread pool
+    needed = shard_files[1:min_shards]
+    if needed:
+        with ThreadPoolExecutor(max_workers=min(8, len(needed))) as ex:
+            shard_objs = [first_obj] + list(ex.map(_load_shard, needed))
+    else:
+        shard_objs = [first_obj]
+
+    seen_ids = set()
+    for shard_obj in shard_objs:
+
+        # get values from file
+        id = shard_obj['id']
+        value = shard_obj['shard']
+        fingerprint = shard_obj['fingerprint']
+
+        # All shards of a pool must agree on the threshold
+        if shard_obj['min_shards'] != min_shards:
+            print(f"ERROR: Shard #{id} reports a different minimum ({shard_obj['min_shards']}) than the first shard ({min_shards})")
+            return False
+
+        # Reject duplicate shards early
+        if id in seen_ids:
+            print(f"ERROR: Shard #{id} was supplied more than once")
+            return False
+        seen_ids.add(id)
+
+        # Check fingerprint, honoring the format the file was written with
+        fingerprint_new = _fingerprint(id, value,
+                                       shard_obj.get('fingerprint_version', 1))
+        if fingerprint != fingerprint_new:
+            print(f"ERROR: Fingerprint for shard #{id} not matching")
+            return False
+
+        # Build the tuple for further processing
+        shard_tuples.append((id, value))
 
     # Reconstruct the original secret in its int represenation
     secret_int = recover_secret(shard_tuples, min_shards)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ---------------------------------------------------------------------------
+# ------------------- Shamir's Secret Sharing (JIT kernels) -----------------
+# sss_fast.py
+#
+# Optional Numba-accelerated share evaluation for the default 127-bit
+# Mersenne prime. Values are carried as four 32-bit limbs (stored in
+# uint64 so limb products never overflow), which keeps the whole Horner
+# sweep in machine integers instead of CPython bignums. sss.py imports
+# this module opportunistically and falls back to the pure-Python path
+# when Numba is not installed.
+
+import numpy as np
+from numba import njit, uint64
+
+_MASK32 = 0xFFFFFFFF
+# 2**127 - 1 as four 32-bit limbs, least significant first
+_P_LIMBS = (0xFFFFFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0x7FFFFFFF)
+
+
+def _to_limbs(n):
+    """Splits an int < 2**127 into four little-endian 32-bit limbs."""
+    return (n & _MASK32, (n >> 32) & _MASK32,
+            (n >> 64) & _MASK32, (n >> 96) & _MASK32)
+
+
+def _from_limbs(limbs):
+    """Reassembles an int from four little-endian 32-bit limbs."""
+    return (int(limbs[0]) | int(limbs[1]) << 32
+            | int(limbs[2]) << 64 | int(limbs[3]) << 96)
+
+
+@njit(cache=True)
+def _eval_kernel(coeffs, xs, out):
+    """Horner-evaluates the polynomial given by coeffs (k x 4 limb rows,
+    highest-degree first) at every x in xs, writing limb rows to out.
+    All arithmetic is modulo 2**127 - 1 via shift/mask folding.
+    """
+    zero = uint64(0)
+    one = uint64(1)
+    sh31 = uint64(31)
+    sh32 = uint64(32)
+    mask = uint64(_MASK32)
+    mask31 = uint64(0x7FFFFFFF)
+    p0 = uint64(_P_LIMBS[0])
+    p3 = uint64(_P_LIMBS[3])
+    for s in range(xs.shape[0]):
+        x = xs[s]
+        r0 = zero
+        r1 = zero
+        r2 = zero
+        r3 = zero
+        for c in range(coeffs.shape[0]):
+            # accum = accum * x + coeff, limb by limb with carries
+            t0 = r0 * x + coeffs[c, 0]
+            t1 = r1 * x + coeffs[c, 1] + (t0 >> sh32)
+            t2 = r2 * x + coeffs[c, 2] + (t1 >> sh32)
+            t3 = r3 * x + coeffs[c, 3] + (t2 >> sh32)
+            r0 = t0 & mask
+            r1 = t1 & mask
+            r2 = t2 & mask
+            r3 = t3 & mask
+            # Mersenne fold: add (value >> 127) back onto the low bits
+            top = (t3 >> sh32) << one | (r3 >> sh31)
+            r3 = r3 & mask31
+            t0 = r0 + top
+            r0 = t0 & mask
+            t1 = r1 + (t0 >> sh32)
+            r1 = t1 & mask
+            t2 = r2 + (t1 >> sh32)
+            r2 = t2 & mask
+            r3 = r3 + (t2 >> sh32)
+            # the add may have carried into bit 127: fold once more
+            top = r3 >> sh31
+            r3 = r3 & mask31
+            t0 = r0 + top
+            r0 = t0 & mask
+            t1 = r1 + (t0 >> sh32)
+            r1 = t1 & mask
+            t2 = r2 + (t1 >> sh32)
+            r2 = t2 & mask
+            r3 = r3 + (t2 >> sh32)
+            # the only value >= p still representable is p itself
+            if r3 == p3 and r2 == p0 and r1 == p0 and r0 == p0:
+                r0 = zero
+                r1 = zero
+                r2 = zero
+                r3 = zero
+        out[s, 0] = r0
+        out[s, 1] = r1
+        out[s, 2] = r2
+        out[s, 3] = r3
+
+
+def eval_shares(poly, shares):
+    """Evaluates poly (coefficient list, constant term first) at all
+    x in 1..shares, returning the same (x, y) point list as the pure
+    Python path in sss.make_random_shares.
+    """
+    coeffs = np.empty((len(poly), 4), dtype=np.uint64)
+    for i, coeff in enumerate(reversed(poly)):
+        coeffs[i] = _to_limbs(coeff)
+    xs = np.arange(1, shares + 1, dtype=np.uint64)
+    out = np.empty((shares, 4), dtype=np.uint64)
+    _eval_kernel(coeffs, xs, out)
+    return [(i + 1, _from_limbs(out[i])) for i in range(shares)]